@@ -23,6 +23,7 @@ def check_and_install_dependencies():
     """Check for required packages and install if missing"""
     required_packages = {
         'aiohttp': 'aiohttp',
+        'aiodns': 'aiodns',
     }
     
     print("\n" + "="*80)
@@ -84,18 +85,28 @@ check_and_install_dependencies()
 
 # Now import the packages
 import asyncio
+import contextlib
 import aiohttp
 import time
 import statistics
 import socket
+import ipaddress
+import re
 import json
 import csv
 from datetime import datetime
 from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict, fields
+from dataclasses import dataclass, fields, replace
+from operator import attrgetter
 import argparse
 
-@dataclass
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Slotted dataclasses need Python 3.10+, older versions fall back to a regular __dict__
+@dataclass(**({'slots': True} if sys.version_info >= (3, 10) else {}))
 class TestResult:
     dns_entry: str
     channel_id: str
@@ -110,6 +121,87 @@ class TestResult:
     hosting_provider: Optional[str]
     success_rate: float
     error_message: Optional[str] = None
+    copied_from: Optional[str] = None
+
+async def read_json(resp: aiohttp.ClientResponse):
+    """Parse a JSON response body, using orjson when it is installed"""
+    # Non-JSON content types go through resp.json() so both paths reject them the same way
+    if orjson is None or 'json' not in resp.content_type:
+        return await resp.json()
+    return orjson.loads(await resp.read())
+
+def extract_domain(dns_entry: str) -> str:
+    """Strip the scheme, port and path from a DNS entry URL"""
+    host = dns_entry.replace('http://', '').replace('https://', '').split('/')[0]
+    if host.startswith('['):
+        return host[1:].split(']')[0]
+    return host.rsplit(':', 1)[0] if host.count(':') == 1 else host
+
+class LinkGate:
+    """Reader/writer gate for the client's link: latency pings share it, throughput samples get it alone"""
+    
+    def __init__(self):
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+    
+    @contextlib.asynccontextmanager
+    async def read(self):
+        async with self._cond:
+            # Waiting writers go first so a steady stream of pings can't starve them
+            await self._cond.wait_for(lambda: not self._writing and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._readers -= 1
+                self._cond.notify_all()
+    
+    @contextlib.asynccontextmanager
+    async def write(self):
+        async with self._cond:
+            self._writers_waiting += 1
+            try:
+                await self._cond.wait_for(lambda: not self._writing and not self._readers)
+            finally:
+                self._writers_waiting -= 1
+                self._cond.notify_all()
+            self._writing = True
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+class CachingResolver(aiohttp.abc.AbstractResolver):
+    """Resolver wrapper that remembers lookups, so the tester and the connector share them"""
+    
+    def __init__(self, resolver: aiohttp.abc.AbstractResolver, ttl: int = 600):
+        self._resolver = resolver
+        self._ttl = ttl
+        self._cache = {}
+    
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict]:
+        key = (host, family)
+        cached = self._cache.get(key)
+        if cached is None or time.monotonic() - cached[0] > self._ttl:
+            # Store the pending lookup so concurrent callers wait on it instead of resolving again
+            cached = (time.monotonic(), asyncio.ensure_future(self._resolver.resolve(host, port, family)))
+            self._cache[key] = cached
+        try:
+            hosts = await asyncio.shield(cached[1])
+        except Exception:
+            if self._cache.get(key) is cached:
+                del self._cache[key]
+            raise
+        # Lookups are shared across ports, so hand back the port that was asked for
+        return [dict(entry, port=port) for entry in hosts]
+    
+    async def close(self):
+        await self._resolver.close()
 
 class CDNTester:
     USER_AGENTS = {
@@ -117,10 +209,98 @@ class CDNTester:
         'vlc': 'VLC/3.0.18 LibVLC/3.0.18'
     }
     
-    def __init__(self, username: str, password: str, user_agent: str = 'tivimate'):
+    # Max channels tested at the same time against one endpoint
+    CHANNEL_CONCURRENCY = 4
+    
+    # HEAD requests sent per channel when measuring latency
+    NUM_PINGS = 5
+    
+    # Bytes sampled per channel when measuring throughput
+    THROUGHPUT_BYTES = 1024 * 1024
+    
+    # Organization-name rules for identify_hosting_provider, checked in order
+    _HOST_RULES = [(re.compile('|'.join(map(re.escape, keywords))), label) for keywords, label in [
+        # Cloud providers
+        (['cloudflare', 'cf-', 'cloud flare'], 'Cloudflare'),
+        (['amazon', 'aws', 'ec2'], 'Amazon Web Services (AWS)'),
+        (['google', 'gcp'], 'Google Cloud Platform (GCP)'),
+        (['microsoft', 'azure', 'msft'], 'Microsoft Azure'),
+        (['digitalocean', 'digital ocean'], 'DigitalOcean'),
+        (['linode', 'akamai'], 'Linode/Akamai'),
+        (['ovh'], 'OVH'),
+        (['hetzner'], 'Hetzner'),
+        (['vultr'], 'Vultr'),
+        (['alibaba', 'aliyun'], 'Alibaba Cloud'),
+        (['oracle'], 'Oracle Cloud'),
+        (['ibm', 'softlayer'], 'IBM Cloud'),
+        (['rackspace'], 'Rackspace'),
+        (['contabo'], 'Contabo'),
+        # CDN providers
+        (['fastly'], 'Fastly CDN'),
+        (['cdn77'], 'CDN77'),
+        (['stackpath', 'highwinds'], 'StackPath'),
+        (['bunny'], 'BunnyCDN'),
+    ]]
+    
+    _ASN_MAP = {
+        '13335': 'Cloudflare',
+        '16509': 'Amazon Web Services (AWS)',
+        '14618': 'Amazon Web Services (AWS)',
+        '15169': 'Google Cloud Platform (GCP)',
+        '8075': 'Microsoft Azure',
+    }
+    _ASN_MAP.update({f'as{number}': label for number, label in _ASN_MAP.items()})
+    
+    _GENERIC_HOSTING = re.compile('hosting|host|server|datacenter|data center')
+    _GENERIC_ISP = re.compile('telecom|communications|isp|internet')
+    
+    # On-disk cache of ASN/geolocation lookups, entries expire after a day
+    ASN_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cdn_tester_asn.json')
+    ASN_CACHE_TTL = 24 * 3600
+    
+    def __init__(self, username: str, password: str, user_agent: str = 'tivimate',
+                 resolver: Optional[aiohttp.abc.AbstractResolver] = None):
         self.username = username
         self.password = password
         self.user_agent = self.USER_AGENTS.get(user_agent.lower(), self.USER_AGENTS['tivimate'])
+        self.resolver = resolver
+        self._asn_cache = self.load_asn_cache()
+        self._dns_cache = {}
+        self._ua_headers = {'User-Agent': self.user_agent}
+        self._range_headers = {**self._ua_headers, 'Range': f'bytes=0-{self.THROUGHPUT_BYTES - 1}'}
+        self._link_gate = LinkGate()
+    
+    def load_asn_cache(self) -> Dict[str, tuple]:
+        """Load unexpired ASN lookups from the on-disk cache"""
+        try:
+            with open(self.ASN_CACHE_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        now = time.time()
+        cache = {}
+        if isinstance(data, dict):
+            for ip, entry in data.items():
+                try:
+                    fetched_at, info = entry
+                    # Skip hand-edited or stale-format entries, callers unpack exactly (asn, geo, hosting)
+                    if (not isinstance(info, list) or len(info) != 3
+                            or not all(item is None or isinstance(item, str) for item in info)):
+                        continue
+                    if now - fetched_at < self.ASN_CACHE_TTL:
+                        cache[ip] = (fetched_at, tuple(info))
+                except (TypeError, ValueError):
+                    continue
+        return cache
+    
+    def save_asn_cache(self):
+        """Write ASN lookups to the on-disk cache"""
+        try:
+            with open(self.ASN_CACHE_FILE, 'w', encoding='utf-8') as f:
+                json.dump(self._asn_cache, f)
+        except OSError as e:
+            print(f"⚠️  Could not save ASN cache: {e}")
     
     async def get_xtream_categories(self, dns_entry: str, session: aiohttp.ClientSession) -> List[Dict]:
         """Fetch available live stream categories from Xtream API"""
@@ -129,11 +309,24 @@ class CDNTester:
             
             print(f"\n📋 Fetching categories from Xtream API...")
             async with session.get(api_url, timeout=30) as resp:
+                if resp.status in [401, 403]:
+                    print(f"❌ Invalid credentials (HTTP {resp.status})")
+                    return []
                 if resp.status != 200:
                     print(f"❌ Failed to fetch categories (HTTP {resp.status})")
                     return []
                 
-                categories = await resp.json()
+                categories = await read_json(resp)
+                
+                # Some panels answer bad credentials or inactive accounts with 200 and a user_info object
+                user_info = categories.get('user_info') if isinstance(categories, dict) else None
+                if isinstance(user_info, dict):
+                    if str(user_info.get('auth', '')) == '0':
+                        print(f"❌ Invalid credentials")
+                        return []
+                    status = user_info.get('status', '')
+                    if status and status != 'Active':
+                        print(f"⚠️  Account status: {status}")
                 
                 if not isinstance(categories, list) or len(categories) == 0:
                     print(f"❌ No categories found")
@@ -156,7 +349,7 @@ class CDNTester:
                 if resp.status != 200:
                     return []
                 
-                channels = await resp.json()
+                channels = await read_json(resp)
                 
                 if isinstance(channels, list):
                     return channels
@@ -166,128 +359,128 @@ class CDNTester:
         
         return []
     
-    async def verify_xtream_credentials(self, dns_entry: str, session: aiohttp.ClientSession) -> bool:
-        """Verify Xtream Codes credentials"""
-        try:
-            api_url = f"{dns_entry}/player_api.php?username={self.username}&password={self.password}"
-            
-            async with session.get(api_url, timeout=10) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if isinstance(data, dict) and 'user_info' in data:
-                        status = data['user_info'].get('status', '')
-                        if status == 'Active':
-                            return True
-                        else:
-                            print(f"⚠️  Account status: {status}")
-                    return True
-        except Exception as e:
-            print(f"❌ Credential verification failed: {e}")
-        
-        return False
-    
     async def resolve_dns(self, domain: str) -> Optional[str]:
         """Resolve domain to IP address"""
+        # IP literals need no lookup
         try:
-            loop = asyncio.get_event_loop()
-            ip = await loop.getaddrinfo(domain, None)
-            return ip[0][4][0]
+            ipaddress.ip_address(domain)
+            return domain
+        except ValueError:
+            pass
+        
+        if domain in self._dns_cache:
+            return self._dns_cache[domain]
+        
+        try:
+            if self.resolver is not None:
+                # The session's connector uses the same CachingResolver, so it reuses this lookup
+                hosts = await self.resolver.resolve(domain, 0, socket.AF_UNSPEC)
+                ip = hosts[0]['host']
+            else:
+                loop = asyncio.get_event_loop()
+                ip = (await loop.getaddrinfo(domain, None))[0][4][0]
+            self._dns_cache[domain] = ip
+            return ip
         except Exception as e:
             print(f"DNS resolution failed for {domain}: {e}")
             return None
     
     async def get_asn_info(self, ip: str, session: aiohttp.ClientSession) -> tuple:
         """Get ASN and geolocation info from IP"""
+        cached = self._asn_cache.get(ip)
+        if cached and time.time() - cached[0] < self.ASN_CACHE_TTL:
+            return cached[1]
+        
         try:
             async with session.get(f'https://ipapi.co/{ip}/json/', timeout=5) as resp:
                 if resp.status == 200:
-                    data = await resp.json()
-                    asn = f"AS{data.get('asn', 'Unknown')} - {data.get('org', 'Unknown')}"
+                    data = await read_json(resp)
+                    asn = self.format_asn(data.get('asn'), data.get('org'))
                     geo = f"{data.get('city', 'Unknown')}, {data.get('country_name', 'Unknown')}"
                     hosting = self.identify_hosting_provider(data.get('org', ''), data.get('asn', ''))
+                    self._asn_cache[ip] = (time.time(), (asn, geo, hosting))
                     return asn, geo, hosting
         except Exception as e:
             print(f"ASN lookup failed for {ip}: {e}")
         return None, None, None
     
+    async def prefetch_asn_info(self, ips: List[str], session: aiohttp.ClientSession):
+        """Look up ASN info for many IPs at once via the ip-api.com batch endpoint"""
+        now = time.time()
+        missing = sorted({ip for ip in ips if ip and not (
+            ip in self._asn_cache and now - self._asn_cache[ip][0] < self.ASN_CACHE_TTL)})
+        
+        # The batch endpoint accepts at most 100 queries per request
+        for i in range(0, len(missing), 100):
+            batch = [{'query': ip} for ip in missing[i:i + 100]]
+            try:
+                async with session.post('http://ip-api.com/batch?fields=status,query,as,org,city,country',
+                                        json=batch, timeout=10) as resp:
+                    if resp.status != 200:
+                        continue
+                    entries = await read_json(resp)
+            except Exception as e:
+                print(f"Batch ASN lookup failed: {e}")
+                continue
+            
+            for data in entries if isinstance(entries, list) else []:
+                if not isinstance(data, dict) or data.get('status') != 'success':
+                    continue
+                # 'as' looks like "AS13335 Cloudflare, Inc."
+                as_number, _, as_name = (data.get('as') or '').partition(' ')
+                org = data.get('org') or as_name
+                asn = self.format_asn(as_number, org)
+                geo = f"{data.get('city') or 'Unknown'}, {data.get('country') or 'Unknown'}"
+                hosting = self.identify_hosting_provider(org, as_number)
+                self._asn_cache[data['query']] = (now, (asn, geo, hosting))
+    
+    @staticmethod
+    def format_asn(asn, org: Optional[str]) -> str:
+        """Format an ASN as 'AS<number> - <org>', whether or not the source included the AS prefix"""
+        number = str(asn or '').strip()
+        if number.upper().startswith('AS'):
+            number = number[2:]
+        return f"AS{number or 'Unknown'} - {org or 'Unknown'}"
+    
     def identify_hosting_provider(self, org: str, asn: str) -> str:
         """Identify the hosting provider from organization name and ASN"""
         org_lower = org.lower()
-        asn_str = str(asn).lower()
         
-        # Cloud providers
-        if any(x in org_lower for x in ['cloudflare', 'cf-', 'cloud flare']):
-            return 'Cloudflare'
-        elif any(x in org_lower for x in ['amazon', 'aws', 'amazon.com', 'ec2']):
-            return 'Amazon Web Services (AWS)'
-        elif any(x in org_lower for x in ['google', 'gcp', 'google cloud']):
-            return 'Google Cloud Platform (GCP)'
-        elif any(x in org_lower for x in ['microsoft', 'azure', 'msft']):
-            return 'Microsoft Azure'
-        elif any(x in org_lower for x in ['digitalocean', 'digital ocean']):
-            return 'DigitalOcean'
-        elif any(x in org_lower for x in ['linode', 'akamai']):
-            return 'Linode/Akamai'
-        elif any(x in org_lower for x in ['ovh', 'ovhcloud']):
-            return 'OVH'
-        elif any(x in org_lower for x in ['hetzner']):
-            return 'Hetzner'
-        elif any(x in org_lower for x in ['vultr']):
-            return 'Vultr'
-        elif any(x in org_lower for x in ['alibaba', 'aliyun']):
-            return 'Alibaba Cloud'
-        elif any(x in org_lower for x in ['oracle', 'oraclecloud']):
-            return 'Oracle Cloud'
-        elif any(x in org_lower for x in ['ibm', 'softlayer']):
-            return 'IBM Cloud'
-        elif any(x in org_lower for x in ['rackspace']):
-            return 'Rackspace'
-        elif any(x in org_lower for x in ['contabo']):
-            return 'Contabo'
-        
-        # CDN providers
-        elif any(x in org_lower for x in ['fastly']):
-            return 'Fastly CDN'
-        elif any(x in org_lower for x in ['cdn77']):
-            return 'CDN77'
-        elif any(x in org_lower for x in ['stackpath', 'highwinds']):
-            return 'StackPath'
-        elif any(x in org_lower for x in ['bunny', 'bunnycdn']):
-            return 'BunnyCDN'
+        # Cloud and CDN providers
+        for pattern, label in self._HOST_RULES:
+            if pattern.search(org_lower):
+                return label
         
         # Known ASNs
-        elif asn_str in ['13335', 'as13335']:
-            return 'Cloudflare'
-        elif asn_str in ['16509', 'as16509', '14618', 'as14618']:
-            return 'Amazon Web Services (AWS)'
-        elif asn_str in ['15169', 'as15169']:
-            return 'Google Cloud Platform (GCP)'
-        elif asn_str in ['8075', 'as8075']:
-            return 'Microsoft Azure'
+        label = self._ASN_MAP.get(str(asn).lower())
+        if label:
+            return label
         
         # Generic categorization
-        elif any(x in org_lower for x in ['hosting', 'host', 'server', 'datacenter', 'data center']):
+        if self._GENERIC_HOSTING.search(org_lower):
             return f'Hosting Provider ({org})'
-        elif any(x in org_lower for x in ['telecom', 'communications', 'isp', 'internet']):
+        if self._GENERIC_ISP.search(org_lower):
             return f'ISP/Telecom ({org})'
         
         return org if org else 'Unknown'
     
-    async def measure_latency(self, url: str, session: aiohttp.ClientSession, num_pings: int = 5) -> tuple:
+    async def measure_latency(self, url: str, session: aiohttp.ClientSession, num_pings: int = NUM_PINGS) -> tuple:
         """Measure latency and jitter"""
-        latencies = []
-        headers = {'User-Agent': self.user_agent}
+        headers = self._ua_headers
         
-        for _ in range(num_pings):
+        async def _ping() -> Optional[float]:
             try:
-                start = time.perf_counter()
+                start = time.perf_counter_ns()
                 async with session.head(url, headers=headers, timeout=10, allow_redirects=True) as resp:
-                    latency = (time.perf_counter() - start) * 1000
+                    latency = (time.perf_counter_ns() - start) / 1_000_000
                     if resp.status in [200, 302, 401, 403]:
-                        latencies.append(latency)
-                await asyncio.sleep(0.5)
+                        return latency
             except Exception:
-                continue
+                pass
+            return None
+        
+        pings = await asyncio.gather(*[_ping() for _ in range(num_pings)])
+        latencies = [latency for latency in pings if latency is not None]
         
         if not latencies:
             return None, None
@@ -297,23 +490,45 @@ class CDNTester:
         
         return avg_latency, jitter
     
+    async def warm_up(self, url: str, session: aiohttp.ClientSession, count: int):
+        """Open pooled connections with a discarded round of HEAD requests"""
+        async def _head():
+            try:
+                async with session.head(url, headers=self._ua_headers, timeout=10, allow_redirects=True):
+                    pass
+            except Exception:
+                pass
+        
+        await asyncio.gather(*[_head() for _ in range(count)])
+    
     async def measure_throughput(self, url: str, session: aiohttp.ClientSession, duration: int = 5) -> Optional[float]:
-        """Measure download throughput"""
-        headers = {'User-Agent': self.user_agent}
+        """Measure download throughput from the first THROUGHPUT_BYTES of the stream"""
+        headers = self._range_headers
         bytes_downloaded = 0
         
         try:
-            start = time.perf_counter()
             async with session.get(url, headers=headers, timeout=duration + 5) as resp:
-                if resp.status != 200:
+                if resp.status not in [200, 206]:
                     return None
-                    
-                async for chunk in resp.content.iter_chunked(8192):
-                    bytes_downloaded += len(chunk)
-                    if time.perf_counter() - start > duration:
+                
+                # Start the clock once headers are in, so connection setup and time to first
+                # byte (already covered by latency) don't count as download time
+                start = time.perf_counter_ns()
+                deadline = start + duration * 1_000_000_000
+                
+                # Live streams usually ignore Range, so stop at the byte budget or the
+                # duration, whichever comes first. readany() hands back everything already
+                # buffered, so a fast stream takes few iterations.
+                while bytes_downloaded < self.THROUGHPUT_BYTES:
+                    data = await resp.content.readany()
+                    if not data:
                         break
+                    bytes_downloaded += len(data)
+                    if time.perf_counter_ns() > deadline:
+                        break
+                
+                elapsed = max(time.perf_counter_ns() - start, 1) / 1_000_000_000
             
-            elapsed = time.perf_counter() - start
             throughput_mbps = (bytes_downloaded * 8) / (elapsed * 1_000_000)
             return throughput_mbps
             
@@ -329,10 +544,10 @@ class CDNTester:
     async def test_endpoint(self, dns_entry: str, channels: List[Dict], session: aiohttp.ClientSession) -> List[TestResult]:
         """Test a single DNS endpoint with selected channels"""
         results = []
+        timestamp = datetime.now().isoformat()
         
         # Resolve DNS
-        domain = dns_entry.replace('http://', '').replace('https://', '').split('/')[0]
-        ip_address = await self.resolve_dns(domain)
+        ip_address = await self.resolve_dns(extract_domain(dns_entry))
         
         if not ip_address:
             for channel in channels:
@@ -340,7 +555,7 @@ class CDNTester:
                     dns_entry=dns_entry,
                     channel_id=str(channel.get('stream_id', 'unknown')),
                     channel_name=channel.get('name', 'Unknown'),
-                    timestamp=datetime.now().isoformat(),
+                    timestamp=timestamp,
                     avg_latency_ms=0,
                     jitter_ms=0,
                     throughput_mbps=0,
@@ -356,77 +571,121 @@ class CDNTester:
         # Get ASN and geolocation
         asn, geo, hosting = await self.get_asn_info(ip_address, session)
         
-        print(f"\n{'='*80}")
-        print(f"Testing {dns_entry} ({ip_address})")
-        print(f"Hosting: {hosting or 'Unknown'}")
-        print(f"ASN: {asn or 'Unknown'}, Location: {geo or 'Unknown'}")
-        print(f"{'='*80}")
+        # Measure latency for every channel first, concurrently but capped so the origin isn't
+        # flooded. The read side of the link gate keeps throughput downloads (from any endpoint)
+        # off the link meanwhile, so their queueing delay isn't counted as latency.
+        sem = asyncio.Semaphore(self.CHANNEL_CONCURRENCY)
+        base_url = f"{dns_entry}/live/{self.username}/{self.password}/"
+        urls = [f"{base_url}{channel.get('stream_id')}.ts" for channel in channels]
+        
+        async def _latency(url: str) -> tuple:
+            async with sem:
+                return await self.measure_latency(url, session)
+        
+        async with self._link_gate.read():
+            # Open as many keepalive connections as the channels can use at once, so every
+            # channel's pings run on warm connections instead of the first ones paying setup
+            if urls:
+                await self.warm_up(urls[0], session, self.CHANNEL_CONCURRENCY * self.NUM_PINGS)
+            latencies = await asyncio.gather(*[_latency(url) for url in urls])
+        
+        # Then sample throughput one download at a time, with no pings running anywhere
+        results = []
+        for channel, url, (avg_latency, jitter) in zip(channels, urls, latencies):
+            throughput = None
+            if avg_latency is not None:
+                async with self._link_gate.write():
+                    throughput = await self.measure_throughput(url, session)
+            results.append(self._channel_result(dns_entry, channel, ip_address, asn, geo, hosting, timestamp,
+                                                avg_latency, jitter, throughput))
+        
+        # Print the whole endpoint block at once so concurrent endpoints don't interleave
+        lines = [
+            f"\n{'='*80}",
+            f"Testing {dns_entry} ({ip_address})",
+            f"Hosting: {hosting or 'Unknown'}",
+            f"ASN: {asn or 'Unknown'}, Location: {geo or 'Unknown'}",
+            f"{'='*80}",
+        ]
+        for result in results:
+            lines.append(f"\n  📺 Testing: {result.channel_name} (ID: {result.channel_id})")
+            if result.success_rate > 0:
+                lines.append(f"     ✓ Latency: {result.avg_latency_ms}ms | Jitter: {result.jitter_ms}ms | Throughput: {result.throughput_mbps}Mbps")
+            else:
+                lines.append(f"     ✗ {result.error_message}")
+        print("\n".join(lines))
+        
+        return results
+    
+    def _channel_result(self, dns_entry: str, channel: Dict, ip_address: str, asn: Optional[str],
+                        geo: Optional[str], hosting: Optional[str], timestamp: str, avg_latency: Optional[float],
+                        jitter: Optional[float], throughput: Optional[float]) -> TestResult:
+        """Build the result row for one channel from its measurements"""
+        stream_id = channel.get('stream_id')
+        channel_name = channel.get('name', 'Unknown')
         
-        # Test each channel
-        for channel in channels:
-            stream_id = channel.get('stream_id')
-            channel_name = channel.get('name', 'Unknown')
-            
-            url = f"{dns_entry}/live/{self.username}/{self.password}/{stream_id}.ts"
-            print(f"\n  📺 Testing: {channel_name} (ID: {stream_id})")
-            
-            # Measure latency and jitter
-            avg_latency, jitter = await self.measure_latency(url, session)
-            
-            if avg_latency is None:
-                results.append(TestResult(
-                    dns_entry=dns_entry,
-                    channel_id=str(stream_id),
-                    channel_name=channel_name,
-                    timestamp=datetime.now().isoformat(),
-                    avg_latency_ms=0,
-                    jitter_ms=0,
-                    throughput_mbps=0,
-                    ip_address=ip_address,
-                    asn=asn,
-                    geolocation=geo,
-                    hosting_provider=hosting,
-                    success_rate=0,
-                    error_message="Connection failed"
-                ))
-                continue
-            
-            # Measure throughput
-            throughput = await self.measure_throughput(url, session)
-            
-            result = TestResult(
+        if avg_latency is None:
+            return TestResult(
                 dns_entry=dns_entry,
                 channel_id=str(stream_id),
                 channel_name=channel_name,
-                timestamp=datetime.now().isoformat(),
-                avg_latency_ms=round(avg_latency, 2),
-                jitter_ms=round(jitter, 2),
-                throughput_mbps=round(throughput, 2) if throughput else 0,
+                timestamp=timestamp,
+                avg_latency_ms=0,
+                jitter_ms=0,
+                throughput_mbps=0,
                 ip_address=ip_address,
                 asn=asn,
                 geolocation=geo,
                 hosting_provider=hosting,
-                success_rate=100.0,
-                error_message=None
+                success_rate=0,
+                error_message="Connection failed"
             )
-            
-            results.append(result)
-            print(f"     ✓ Latency: {result.avg_latency_ms}ms | Jitter: {result.jitter_ms}ms | Throughput: {result.throughput_mbps}Mbps")
         
-        return results
-    
-    async def run_tests(self, dns_entries: List[str], channels: List[Dict]) -> List[TestResult]:
-        """Run tests on all DNS entries"""
+        return TestResult(
+            dns_entry=dns_entry,
+            channel_id=str(stream_id),
+            channel_name=channel_name,
+            timestamp=timestamp,
+            avg_latency_ms=round(avg_latency, 2),
+            jitter_ms=round(jitter, 2),
+            throughput_mbps=round(throughput, 2) if throughput else 0,
+            ip_address=ip_address,
+            asn=asn,
+            geolocation=geo,
+            hosting_provider=hosting,
+            success_rate=100.0,
+            error_message=None
+        )
+    
+    async def run_tests(self, dns_entries: List[str], channels: List[Dict], session: aiohttp.ClientSession,
+                        parallel: int = 5, dedup_ip: bool = False) -> List[TestResult]:
+        """Run tests on all DNS entries concurrently"""
         all_results = []
         
-        connector = aiohttp.TCPConnector(limit=10, force_close=True)
-        timeout = aiohttp.ClientTimeout(total=30)
+        # Resolve every endpoint up front so ASN info can be fetched in one batch
+        ips = await asyncio.gather(*[self.resolve_dns(extract_domain(d)) for d in dns_entries])
+        await self.prefetch_asn_info([ip for ip in ips if ip], session)
         
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            for dns_entry in dns_entries:
-                results = await self.test_endpoint(dns_entry, channels, session)
-                all_results.extend(results)
-                await asyncio.sleep(1)
+        # With dedup_ip, entries that only differ by a hostname resolving to the same IP are
+        # tested once and the results copied to the aliases. This is opt-in because shared
+        # front ends (e.g. Cloudflare) route different hostnames on one IP to different origins.
+        groups = {}
+        for dns_entry, ip in zip(dns_entries, ips):
+            key = dns_entry.replace(extract_domain(dns_entry), ip, 1) if ip and dedup_ip else dns_entry
+            groups.setdefault(key, []).append(dns_entry)
+        
+        sem = asyncio.Semaphore(max(1, parallel))
+        
+        async def _one(dns_entry: str) -> List[TestResult]:
+            async with sem:
+                return await self.test_endpoint(dns_entry, channels, session)
+        
+        grouped = await asyncio.gather(*[_one(aliases[0]) for aliases in groups.values()])
+        for aliases, results in zip(groups.values(), grouped):
+            all_results.extend(results)
+            for alias in aliases[1:]:
+                print(f"\n↪️  {alias} resolves to the same server as {aliases[0]}, reusing its results")
+                all_results.extend(replace(r, dns_entry=alias, copied_from=aliases[0]) for r in results)
         
         return all_results
     
@@ -443,13 +702,22 @@ class CDNTester:
                 by_dns[result.dns_entry] = []
             by_dns[result.dns_entry].append(result)
         
+        # Average the successful results of each DNS entry in a single pass
+        averages = {}
+        for dns, res_list in by_dns.items():
+            n = lat = jit = thr = 0
+            for r in res_list:
+                if r.success_rate > 0:
+                    n += 1
+                    lat += r.avg_latency_ms
+                    jit += r.jitter_ms
+                    thr += r.throughput_mbps
+            averages[dns] = (n, lat / n, jit / n, thr / n) if n else (0, 0, 0, 0)
+        
         # Sort DNS entries by average performance
         dns_scores = {}
-        for dns, res_list in by_dns.items():
-            successful = [r for r in res_list if r.success_rate > 0]
-            if successful:
-                avg_latency = statistics.mean([r.avg_latency_ms for r in successful])
-                avg_throughput = statistics.mean([r.throughput_mbps for r in successful])
+        for dns, (n, avg_latency, _, avg_throughput) in averages.items():
+            if n:
                 dns_scores[dns] = avg_latency - (avg_throughput * 10)
             else:
                 dns_scores[dns] = float('inf')
@@ -467,17 +735,16 @@ class CDNTester:
                 report.append(f"ASN: {res_list[0].asn or 'Unknown'}")
                 report.append(f"Location: {res_list[0].geolocation or 'Unknown'}")
             
-            successful = [r for r in res_list if r.success_rate > 0]
-            if successful:
-                avg_lat = statistics.mean([r.avg_latency_ms for r in successful])
-                avg_jit = statistics.mean([r.jitter_ms for r in successful])
-                avg_thr = statistics.mean([r.throughput_mbps for r in successful])
-                
+            if res_list[0].copied_from:
+                report.append(f"ℹ️  Not tested, results copied from {res_list[0].copied_from} (same IP)")
+            
+            n, avg_lat, avg_jit, avg_thr = averages[dns]
+            if n:
                 report.append(f"\nAverage Performance:")
                 report.append(f"  Latency: {avg_lat:.2f}ms")
                 report.append(f"  Jitter: {avg_jit:.2f}ms")
                 report.append(f"  Throughput: {avg_thr:.2f}Mbps")
-                report.append(f"  Success Rate: {len(successful)}/{len(res_list)} channels")
+                report.append(f"  Success Rate: {n}/{len(res_list)} channels")
             else:
                 report.append("\n⚠️  All tests failed for this endpoint")
             
@@ -494,106 +761,100 @@ class CDNTester:
         
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = [field.name for field in fields(TestResult)]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.writer(csvfile)
             
-            writer.writeheader()
-            for result in results:
-                writer.writerow(asdict(result))
+            writer.writerow(fieldnames)
+            writer.writerows(map(attrgetter(*fieldnames), results))
         
         print(f"\n✅ Results saved to {filename}")
 
-async def interactive_category_selection(dns_entry: str, username: str, password: str) -> List[Dict]:
+async def interactive_category_selection(dns_entry: str, username: str, password: str,
+                                         session: aiohttp.ClientSession) -> List[Dict]:
     """Interactive category and channel selection"""
-    connector = aiohttp.TCPConnector(limit=10, force_close=True)
-    timeout = aiohttp.ClientTimeout(total=30)
+    tester = CDNTester(username, password)
     
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        tester = CDNTester(username, password)
-        
-        # Verify credentials
-        print(f"\n🔑 Verifying credentials for {dns_entry}...")
-        if not await tester.verify_xtream_credentials(dns_entry, session):
-            print("❌ Invalid credentials or connection failed")
-            return []
-        
-        print("✅ Credentials verified")
-        
-        # Get categories
-        categories = await tester.get_xtream_categories(dns_entry, session)
-        
-        if not categories:
-            return []
-        
-        # Display categories
-        print("\n" + "="*80)
-        print("AVAILABLE CATEGORIES")
-        print("="*80)
-        for idx, cat in enumerate(categories, 1):
-            cat_name = cat.get('category_name', 'Unknown')
-            print(f"{idx}. {cat_name}")
-        
-        # Let user select categories
-        print("\n📝 Enter category numbers to fetch (separate with spaces, e.g., '1 3 5'):")
-        print("   Or press Enter to use all categories")
-        selection = input("> ").strip()
-        
-        selected_categories = []
-        if selection:
-            try:
-                indices = [int(x) - 1 for x in selection.split()]
-                selected_categories = [categories[i] for i in indices if 0 <= i < len(categories)]
-            except (ValueError, IndexError):
-                print("⚠️  Invalid selection, using all categories")
-                selected_categories = categories
-        else:
+    # Get categories, a successful listing also confirms the credentials
+    categories = await tester.get_xtream_categories(dns_entry, session)
+    
+    if not categories:
+        return []
+    
+    print("✅ Credentials verified")
+    
+    # Display categories
+    print("\n" + "="*80)
+    print("AVAILABLE CATEGORIES")
+    print("="*80)
+    for idx, cat in enumerate(categories, 1):
+        cat_name = cat.get('category_name', 'Unknown')
+        print(f"{idx}. {cat_name}")
+    
+    # Let user select categories
+    print("\n📝 Enter category numbers to fetch (separate with spaces, e.g., '1 3 5'):")
+    print("   Or press Enter to use all categories")
+    selection = input("> ").strip()
+    
+    selected_categories = []
+    if selection:
+        try:
+            indices = [int(x) - 1 for x in selection.split()]
+            selected_categories = [categories[i] for i in indices if 0 <= i < len(categories)]
+        except (ValueError, IndexError):
+            print("⚠️  Invalid selection, using all categories")
             selected_categories = categories
-        
-        # Fetch channels from selected categories
-        all_channels = []
-        for cat in selected_categories:
-            cat_id = cat.get('category_id')
-            cat_name = cat.get('category_name', 'Unknown')
-            print(f"\n📡 Fetching channels from '{cat_name}'...")
-            
-            channels = await tester.get_channels_by_category(dns_entry, cat_id, session)
-            if channels:
-                print(f"   ✓ Found {len(channels)} channels")
-                all_channels.extend(channels)
-        
-        if not all_channels:
-            print("\n❌ No channels found in selected categories")
-            return []
-        
-        # Display channels
-        print("\n" + "="*80)
-        print(f"FOUND {len(all_channels)} CHANNELS")
-        print("="*80)
-        for idx, ch in enumerate(all_channels[:50], 1):  # Show first 50
-            ch_name = ch.get('name', 'Unknown')
-            ch_id = ch.get('stream_id', 'N/A')
-            print(f"{idx}. {ch_name} (ID: {ch_id})")
-        
-        if len(all_channels) > 50:
-            print(f"... and {len(all_channels) - 50} more channels")
-        
-        # Let user select channels
-        print("\n📝 Enter channel numbers to test (separate with spaces, max 10):")
-        print("   Or press Enter to use first 10 channels")
-        selection = input("> ").strip()
-        
-        selected_channels = []
-        if selection:
-            try:
-                indices = [int(x) - 1 for x in selection.split()]
-                selected_channels = [all_channels[i] for i in indices if 0 <= i < len(all_channels)][:10]
-            except (ValueError, IndexError):
-                print("⚠️  Invalid selection, using first 10 channels")
-                selected_channels = all_channels[:10]
-        else:
+    else:
+        selected_categories = categories
+    
+    # Fetch channels from selected categories concurrently
+    print(f"\n📡 Fetching channels from {len(selected_categories)} categories...")
+    sem = asyncio.Semaphore(8)
+    
+    async def _fetch(cat: Dict) -> List[Dict]:
+        async with sem:
+            return await tester.get_channels_by_category(dns_entry, cat.get('category_id'), session)
+    
+    fetched = await asyncio.gather(*[_fetch(cat) for cat in selected_categories])
+    
+    all_channels = []
+    for cat, channels in zip(selected_categories, fetched):
+        if channels:
+            print(f"   ✓ {cat.get('category_name', 'Unknown')}: {len(channels)} channels")
+            all_channels.extend(channels)
+    
+    if not all_channels:
+        print("\n❌ No channels found in selected categories")
+        return []
+    
+    # Display channels
+    print("\n" + "="*80)
+    print(f"FOUND {len(all_channels)} CHANNELS")
+    print("="*80)
+    for idx, ch in enumerate(all_channels[:50], 1):  # Show first 50
+        ch_name = ch.get('name', 'Unknown')
+        ch_id = ch.get('stream_id', 'N/A')
+        print(f"{idx}. {ch_name} (ID: {ch_id})")
+    
+    if len(all_channels) > 50:
+        print(f"... and {len(all_channels) - 50} more channels")
+    
+    # Let user select channels
+    print("\n📝 Enter channel numbers to test (separate with spaces, max 10):")
+    print("   Or press Enter to use first 10 channels")
+    selection = input("> ").strip()
+    
+    selected_channels = []
+    if selection:
+        try:
+            indices = [int(x) - 1 for x in selection.split()]
+            selected_channels = [all_channels[i] for i in indices if 0 <= i < len(all_channels)][:10]
+        except (ValueError, IndexError):
+            print("⚠️  Invalid selection, using first 10 channels")
             selected_channels = all_channels[:10]
-        
-        print(f"\n✅ Selected {len(selected_channels)} channels for testing")
-        return selected_channels
+    else:
+        selected_channels = all_channels[:10]
+    
+    print(f"\n✅ Selected {len(selected_channels)} channels for testing")
+    return selected_channels
 
 async def main():
     parser = argparse.ArgumentParser(description='Test CDN DNS entries for streaming performance')
@@ -605,6 +866,10 @@ async def main():
                        help='User agent to use (default: tivimate)')
     parser.add_argument('--output', '-o', default='cdn_results.csv',
                        help='Output CSV file (default: cdn_results.csv)')
+    parser.add_argument('--parallel', '-j', type=int, default=5,
+                       help='Number of DNS entries to test at once (default: 5)')
+    parser.add_argument('--dedup-ip', action='store_true',
+                       help='Test DNS entries that resolve to the same IP only once and copy the results')
     
     args = parser.parse_args()
     
@@ -631,25 +896,50 @@ async def main():
         input("\nPress Enter to exit...")
         return
     
-    # Use first DNS for category/channel selection
-    print(f"\n🎯 Using {args.dns_entries[0]} to fetch categories and channels...")
-    selected_channels = await interactive_category_selection(args.dns_entries[0], args.username, args.password)
-    
-    if not selected_channels:
-        print("\n❌ No channels selected. Exiting.")
-        input("\nPress Enter to exit...")
-        return
-    
-    print("\n" + "="*80)
-    print(f"Starting CDN Performance Tests...")
-    print(f"User Agent: {args.user_agent}")
-    print(f"DNS Entries: {len(args.dns_entries)}")
-    print(f"Channels: {len(selected_channels)}")
-    print(f"Output File: {args.output}")
-    print("="*80)
+    # One session for the whole run so requests to the same CDN reuse keepalive connections.
+    # The c-ares resolver keeps lookups off the event loop. It is cached and shared with the
+    # tester, so each endpoint is only resolved once; the connector's own cache is redundant.
+    try:
+        base_resolver = aiohttp.AsyncResolver()
+    except (RuntimeError, ImportError) as e:
+        # e.g. older aiodns on Windows needs a SelectorEventLoop, the default there is Proactor
+        print(f"⚠️  Async DNS resolver unavailable ({e}), using the threaded resolver")
+        base_resolver = aiohttp.ThreadedResolver()
+    resolver = CachingResolver(base_resolver, ttl=600)
+    # Every tested channel can hold NUM_PINGS connections at once, so size the pool for all of them.
+    # Otherwise pings wait for a free connection and the wait is counted as latency.
+    connector = aiohttp.TCPConnector(limit=max(64, args.parallel * CDNTester.CHANNEL_CONCURRENCY * CDNTester.NUM_PINGS),
+                                     limit_per_host=CDNTester.CHANNEL_CONCURRENCY * CDNTester.NUM_PINGS,
+                                     keepalive_timeout=30, use_dns_cache=False, enable_cleanup_closed=True,
+                                     resolver=resolver)
+    timeout = aiohttp.ClientTimeout(total=30)
     
-    tester = CDNTester(args.username, args.password, args.user_agent)
-    results = await tester.run_tests(args.dns_entries, selected_channels)
+    # The connector doesn't own a resolver it was given, so close it ourselves
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            # Use first DNS for category/channel selection
+            print(f"\n🎯 Using {args.dns_entries[0]} to fetch categories and channels...")
+            selected_channels = await interactive_category_selection(args.dns_entries[0], args.username, args.password, session)
+            
+            if not selected_channels:
+                print("\n❌ No channels selected. Exiting.")
+                input("\nPress Enter to exit...")
+                return
+            
+            print("\n" + "="*80)
+            print(f"Starting CDN Performance Tests...")
+            print(f"User Agent: {args.user_agent}")
+            print(f"DNS Entries: {len(args.dns_entries)}")
+            print(f"Channels: {len(selected_channels)}")
+            print(f"Output File: {args.output}")
+            print("="*80)
+            
+            tester = CDNTester(args.username, args.password, args.user_agent, resolver)
+            results = await tester.run_tests(args.dns_entries, selected_channels, session, args.parallel,
+                                             args.dedup_ip)
+            tester.save_asn_cache()
+    finally:
+        await resolver.close()
     
     if not results:
         print("\n❌ No results collected.")